@@ -1,6 +1,8 @@
 """
 Telegram alert notifications for RADAR screener.
 """
+import asyncio
+import functools
 import logging
 import os
 from datetime import datetime
@@ -9,68 +11,107 @@ import httpx
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+_CURRENCY_SYMBOL = "€" if os.getenv("RETAILED_CURRENCY", "EUR") == "EUR" else "$"
 
+_ALERT_TMPL = (
+    "🚨 *TROU D'AIR DÉTECTÉ*\n\n"
+    "📦 *{name}*\n\n"
+    "💰 Prix actuel : *{sym}{ap:.2f}*\n"
+    "📊 Prix de référence : {sym}{mp:.2f}\n"
+    "📉 Discount : *-{pct:.1f}%*\n\n"
+    "👉 [Acheter sur StockX](https://stockx.com/{slug})"
+)
+_BASE_PAYLOAD = {"parse_mode": "Markdown", "disable_web_page_preview": True}
 
-def _get_chat_ids() -> list[str]:
-    """Support multiple chat IDs: comma-separated in TELEGRAM_CHAT_ID."""
+# HTTP/2 multiplexes concurrent sends over one socket, so a few connections are plenty.
+_TG_LIMITS = httpx.Limits(max_keepalive_connections=4, max_connections=4)
+
+_tg_client: httpx.AsyncClient | None = None
+_tg_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_chat_ids() -> tuple[str, ...]:
+    """
+    Support multiple chat IDs: comma-separated in TELEGRAM_CHAT_ID.
+    Parsed once; call _get_chat_ids.cache_clear() after changing the env.
+    """
     raw = os.getenv("TELEGRAM_CHAT_ID", "")
-    return [x.strip() for x in raw.split(",") if x.strip()]
+    return tuple(x.strip() for x in raw.split(",") if x.strip())
 
 logger = logging.getLogger(__name__)
 
 
-def _send_to_telegram(payload: dict) -> bool:
-    """Send message to all configured chat IDs."""
+def _get_tg_client() -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for api.telegram.org (keep-alive across sends).
+    Rebuilt if the running event loop changed: connections are bound to the loop that opened them.
+    """
+    global _tg_client, _tg_client_loop
+    loop = asyncio.get_running_loop()
+    if _tg_client is None or _tg_client_loop is not loop:
+        _tg_client = httpx.AsyncClient(timeout=10.0, http2=True, limits=_TG_LIMITS)
+        _tg_client_loop = loop
+    return _tg_client
+
+
+async def aclose_client() -> None:
+    """Close the shared Telegram AsyncClient (called at app shutdown)."""
+    global _tg_client, _tg_client_loop
+    if _tg_client is not None and _tg_client_loop is asyncio.get_running_loop():
+        await _tg_client.aclose()
+    _tg_client = None
+    _tg_client_loop = None
+
+
+async def _send_to_telegram_async(payload: dict) -> bool:
+    """Send message to all configured chat IDs concurrently (one round-trip regardless of chat count)."""
     chat_ids = _get_chat_ids()
     if not TELEGRAM_BOT_TOKEN or not chat_ids:
         logger.error("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID not configured")
         return False
 
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    client = _get_tg_client()
+    tasks = [client.post(url, json={**payload, "chat_id": cid}) for cid in chat_ids]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
     success = True
-    for cid in chat_ids:
-        try:
-            with httpx.Client(timeout=10.0) as client:
-                r = client.post(url, json={**payload, "chat_id": cid})
-                r.raise_for_status()
-        except httpx.HTTPError as e:
-            logger.error("Failed to send to chat %s: %s", cid, e)
-            success = False
+    for cid, result in zip(chat_ids, results):
+        if not isinstance(result, BaseException):
+            try:
+                result.raise_for_status()
+                continue
+            except httpx.HTTPError as e:
+                result = e
+        logger.error("Failed to send to chat %s: %s", cid, result)
+        success = False
     return success
 
 
-def send_telegram_alert(alert: dict) -> bool:
+def _alert_payload(alert: dict) -> dict:
+    """Build the Telegram payload for a price drop alert."""
+    text = _ALERT_TMPL.format(
+        name=alert.get("product_name", "Unknown"),
+        sym=_CURRENCY_SYMBOL,
+        ap=alert.get("alert_price", 0),
+        mp=alert.get("median_price", 0),
+        pct=alert.get("discount_pct", 0),
+        slug=alert.get("slug", ""),
+    )
+    return {**_BASE_PAYLOAD, "text": text}
+
+
+async def send_telegram_alert_async(alert: dict) -> bool:
     """
     Send a price drop alert to Telegram (to all chat IDs).
     """
-    product_name = alert.get("product_name", "Unknown")
-    alert_price = alert.get("alert_price", 0)
-    median_price = alert.get("median_price", 0)
-    discount_pct = alert.get("discount_pct", 0)
-    slug = alert.get("slug", "")
-
-    currency = os.getenv("RETAILED_CURRENCY", "EUR")
-    symbol = "€" if currency == "EUR" else "$"
-
-    message = (
-        "🚨 *TROU D'AIR DÉTECTÉ*\n\n"
-        f"📦 *{product_name}*\n\n"
-        f"💰 Prix actuel : *{symbol}{alert_price:.2f}*\n"
-        f"📊 Prix de référence : {symbol}{median_price:.2f}\n"
-        f"📉 Discount : *-{discount_pct:.1f}%*\n\n"
-        f"👉 [Acheter sur StockX](https://stockx.com/{slug})"
-    )
-
-    return _send_to_telegram({
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True,
-    })
+    return await _send_to_telegram_async(_alert_payload(alert))
 
 
-def send_telegram_scan_summary(scanned_at: str, products: list[dict], dips_found: int) -> bool:
+def _scan_summary_payload(scanned_at: str, products: list[dict], dips_found: int) -> dict:
     """
-    Send scan summary to Telegram when no price movement (to all chat IDs).
+    Build the Telegram payload for a scan summary.
     products: list of {name, slug}
     """
     try:
@@ -92,8 +133,12 @@ def send_telegram_scan_summary(scanned_at: str, products: list[dict], dips_found
 
     message = header + "\n\n" + "\n\n".join(lines)
 
-    return _send_to_telegram({
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True,
-    })
+    return {**_BASE_PAYLOAD, "text": message}
+
+
+async def send_telegram_scan_summary_async(scanned_at: str, products: list[dict], dips_found: int) -> bool:
+    """
+    Send scan summary to Telegram when no price movement (to all chat IDs).
+    products: list of {name, slug}
+    """
+    return await _send_to_telegram_async(_scan_summary_payload(scanned_at, products, dips_found))
@@ -0,0 +1,36 @@
+"""
+In-memory cache for the enriched GET /products response.
+Shared by main.py (reads, product edits) and scheduler.py (scan results).
+"""
+import threading
+import time
+
+PRODUCTS_CACHE_TTL = 30  # seconds
+
+_lock = threading.Lock()
+_generation = 0
+_products: tuple[float, list[dict]] | None = None
+
+
+def get_cached_products() -> tuple[list[dict] | None, int]:
+    """Return (cached products, or None if missing/expired, current generation)."""
+    with _lock:
+        if _products is not None and time.monotonic() - _products[0] < PRODUCTS_CACHE_TTL:
+            return _products[1], _generation
+        return None, _generation
+
+
+def store_products(products: list[dict], generation: int) -> None:
+    """Cache products computed at `generation`. Dropped if an invalidation happened meanwhile."""
+    global _products
+    with _lock:
+        if generation == _generation:
+            _products = (time.monotonic(), products)
+
+
+def invalidate_products_cache() -> None:
+    """Drop the cache and make any in-flight computation's result stale."""
+    global _products, _generation
+    with _lock:
+        _generation += 1
+        _products = None
@@ -9,16 +9,20 @@ from supabase import create_client, Client
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-_client: Client | None = None
 
+def init_db(url: str | None = SUPABASE_URL, key: str | None = SUPABASE_KEY) -> Client:
+    """
+    Create the shared Supabase client. Runs once at import; call again to point at other credentials.
+    Raises ValueError if the credentials are missing.
+    """
+    global client
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+    client = create_client(url, key)
+    return client
 
-def get_client() -> Client:
-    global _client
-    if _client is None:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
-        _client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return _client
+
+client: Client = init_db()
 
 
 def create_product(
@@ -29,7 +33,6 @@ def create_product(
     image_url: str | None = None,
 ) -> dict:
     """Insert a new product and return it. reference_price = prix Acheter maintenant à l'ajout."""
-    client = get_client()
     data = {"slug": slug, "name": name, "dip_threshold": dip_threshold}
     if reference_price is not None:
         data["reference_price"] = reference_price
@@ -41,50 +44,60 @@ def create_product(
 
 def update_product_image(product_id: str, image_url: str) -> bool:
     """Update product image_url. Returns True if updated."""
-    client = get_client()
     result = client.table("products").update({"image_url": image_url}).eq("id", product_id).execute()
     return len(result.data) > 0
 
 
 def update_product_threshold(slug: str, dip_threshold: float) -> bool:
     """Update dip_threshold for a product."""
-    client = get_client()
     result = client.table("products").update({"dip_threshold": dip_threshold}).eq("slug", slug).execute()
     return len(result.data) > 0
 
 
 def get_product_by_slug(slug: str) -> dict | None:
     """Get product by slug."""
-    client = get_client()
     result = client.table("products").select("*").eq("slug", slug).execute()
     return result.data[0] if result.data else None
 
 
 def get_all_products() -> list[dict]:
     """Get all products."""
-    client = get_client()
     result = client.table("products").select("*").order("created_at", desc=True).execute()
     return result.data or []
 
 
+def get_all_products_lean() -> list[dict]:
+    """Get all products with only the columns the scan uses."""
+    result = (
+        client.table("products")
+        .select("id,slug,name,dip_threshold,reference_price,image_url")
+        .order("created_at", desc=True)
+        .execute()
+    )
+    return result.data or []
+
+
 def delete_product(slug: str) -> bool:
     """Delete product by slug (cascade deletes price_history and alerts)."""
-    client = get_client()
     result = client.table("products").delete().eq("slug", slug).execute()
     return len(result.data) > 0
 
 
 def insert_price_history(product_id: str, price: float) -> dict:
     """Insert a price record."""
-    client = get_client()
     data = {"product_id": product_id, "price": price}
     result = client.table("price_history").insert(data).execute()
     return result.data[0]
 
 
+def insert_price_history_bulk(rows: list[dict]) -> list[dict]:
+    """Insert several price records in one request. rows: [{product_id, price}]."""
+    result = client.table("price_history").insert(rows).execute()
+    return result.data or []
+
+
 def get_price_history_30d(product_id: str) -> list[dict]:
     """Get price history for last 30 days."""
-    client = get_client()
     since = (datetime.utcnow() - timedelta(days=30)).isoformat()
     result = (
         client.table("price_history")
@@ -97,9 +110,43 @@ def get_price_history_30d(product_id: str) -> list[dict]:
     return result.data or []
 
 
+HISTORY_PAGE_SIZE = 1000  # PostgREST default max-rows
+
+
+def get_price_history_30d_bulk(product_ids: list[str]) -> dict[str, list[dict]]:
+    """
+    Get price history for last 30 days for several products, grouped by product_id (oldest first).
+    Paged with .range() so the PostgREST max-rows cap can't silently drop rows.
+    """
+    history: dict[str, list[dict]] = {pid: [] for pid in product_ids}
+    if not product_ids:
+        return history
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    offset = 0
+    while True:
+        result = (
+            client.table("price_history")
+            .select("product_id,price,scanned_at")
+            .in_("product_id", product_ids)
+            .gte("scanned_at", since)
+            .order("scanned_at", desc=True)
+            .order("id", desc=True)
+            .range(offset, offset + HISTORY_PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = result.data or []
+        if not rows:
+            break
+        for row in rows:
+            history.setdefault(row["product_id"], []).append(row)
+        offset += len(rows)
+    for rows in history.values():
+        rows.reverse()
+    return history
+
+
 def get_oldest_price(product_id: str) -> float | None:
     """Get the oldest (first) price recorded for a product. Used as fallback reference_price."""
-    client = get_client()
     result = (
         client.table("price_history")
         .select("price")
@@ -122,7 +169,6 @@ def insert_alert(
     discount_pct: float,
 ) -> dict:
     """Insert an alert record."""
-    client = get_client()
     data = {
         "product_id": product_id,
         "product_name": product_name,
@@ -135,9 +181,14 @@ def insert_alert(
     return result.data[0]
 
 
+def insert_alerts_bulk(alerts: list[dict]) -> list[dict]:
+    """Insert several alert records in one request (same fields as insert_alert)."""
+    result = client.table("alerts").insert(alerts).execute()
+    return result.data or []
+
+
 def get_recent_alerts_for_product(product_id: str, hours: int = 6) -> list[dict]:
     """Check if we already sent an alert for this product in the last N hours (anti-spam)."""
-    client = get_client()
     since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
     result = (
         client.table("alerts")
@@ -149,9 +200,21 @@ def get_recent_alerts_for_product(product_id: str, hours: int = 6) -> list[dict]
     return result.data or []
 
 
+def get_last_alert_timestamps(hours: int = 6) -> dict[str, str]:
+    """Latest triggered_at per product over the last N hours (warms the scheduler's anti-spam cache)."""
+    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+    result = (
+        client.table("alerts")
+        .select("product_id,triggered_at")
+        .gte("triggered_at", since)
+        .order("triggered_at", desc=False)
+        .execute()
+    )
+    return {row["product_id"]: row["triggered_at"] for row in result.data or []}
+
+
 def get_recent_alerts(limit: int = 50) -> list[dict]:
     """Get the N most recent alerts."""
-    client = get_client()
     result = (
         client.table("alerts")
         .select("*")
@@ -164,7 +227,6 @@ def get_recent_alerts(limit: int = 50) -> list[dict]:
 
 def insert_scan(products_count: int, dips_found: int) -> dict:
     """Insert a scan record."""
-    client = get_client()
     data = {"products_count": products_count, "dips_found": dips_found}
     result = client.table("scans").insert(data).execute()
     return result.data[0]
@@ -172,7 +234,6 @@ def insert_scan(products_count: int, dips_found: int) -> dict:
 
 def get_recent_scans(limit: int = 50) -> list[dict]:
     """Get the N most recent scans."""
-    client = get_client()
     result = (
         client.table("scans")
         .select("*")
@@ -6,32 +6,39 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+import asyncio
 import logging
 import re
+import statistics
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
 
+from alerts import _get_chat_ids, _send_to_telegram_async
+from alerts import aclose_client as aclose_telegram_client
+from cache import get_cached_products, invalidate_products_cache, store_products
 from database import (
     create_product,
     delete_product,
     get_all_products,
     get_product_by_slug,
     get_oldest_price,
-    get_price_history_30d,
+    get_price_history_30d_bulk,
     get_recent_alerts,
     get_recent_scans,
     insert_price_history,
     update_product_threshold,
 )
-from retailed import get_product_full
-from scheduler import get_next_scan_time, scan_all_products, start_scheduler
+from retailed import aclose_client, get_product_full
+from scheduler import get_next_scan_time, scan_all_products_async, start_scheduler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="RADAR Screener API")
+app = FastAPI(title="RADAR Screener API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -41,33 +48,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class ProductIn(BaseModel):
+    """POST /products body. threshold = % discount to trigger alert (default 15)."""
+    url: str
+    threshold: float | None = Field(None, ge=1, le=99)
+
+
+class ThresholdIn(BaseModel):
+    """PATCH /products/{slug} body."""
+    threshold: float = Field(..., ge=1, le=99)
+
+
 # Extract slug from StockX URL: .../product-name or .../fr/product-name
 SLUG_PATTERN = re.compile(r"stockx\.com/(?:[a-z]{2}/)?([a-zA-Z0-9-]+)(?:\?|$|/)")
 
 
 def _slug_from_url(url: str) -> str | None:
+    # Fast path for the common shape: https://stockx.com/[xx/]slug[/][?query]
+    _, sep, path = url.partition("stockx.com/")
+    if sep:
+        parts = path.split("?", 1)[0].rstrip("/").split("/")
+        locale = parts[0]
+        if len(parts) == 2 and len(locale) == 2 and locale.isascii() and locale.isalpha() and locale.islower():
+            parts = parts[1:]
+        tail = parts[0]
+        if len(parts) == 1 and tail.isascii() and tail.replace("-", "").isalnum():
+            return tail
     match = SLUG_PATTERN.search(url)
     return match.group(1) if match else None
 
 
 def _slug_to_name(slug: str) -> str:
     """Convert slug to display name (e.g. labubu-the-monsters-zimomo -> Labubu The Monsters Zimomo)."""
-    return " ".join(word.capitalize() for word in slug.split("-"))
+    return slug.replace("-", " ").title()
 
 
 def _compute_median(prices: list[dict]) -> float | None:
-    if not prices:
-        return None
-    values = sorted(float(p["price"]) for p in prices if p.get("price") is not None)
-    if not values:
-        return None
-    n = len(values)
-    return (values[n // 2] + values[(n - 1) // 2]) / 2 if n else None
-
-
-def _enrich_product(product: dict) -> dict:
-    """Add last_price, reference_price, discount_pct to product."""
-    history = get_price_history_30d(product["id"])
+    values = [float(p["price"]) for p in prices if p.get("price") is not None]
+    return statistics.median(values) if values else None
+
+
+def _enrich_product(product: dict, history: list[dict]) -> dict:
+    """Add last_price, reference_price, discount_pct to product. history = its 30d price history."""
     last_price = float(history[-1]["price"]) if history else None
     reference_price = product.get("reference_price")
     if reference_price is not None:
@@ -88,67 +111,52 @@ def _enrich_product(product: dict) -> dict:
 
 
 @app.on_event("startup")
-def startup():
-    start_scheduler()
+async def startup():
+    await start_scheduler()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await aclose_client()
+    await aclose_telegram_client()
 
 
 @app.post("/products")
-def post_products(body: dict):
+async def post_products(body: ProductIn, tasks: BackgroundTasks):
     """Add a product by StockX URL. Optional: threshold (default 15) = % discount to trigger alert."""
-    url = body.get("url")
-    if not url or not isinstance(url, str):
-        raise HTTPException(400, "Missing or invalid 'url' in body")
-
-    slug = _slug_from_url(url)
+    slug = _slug_from_url(body.url)
     if not slug:
         raise HTTPException(400, "Could not extract product slug from URL")
 
-    existing = get_product_by_slug(slug)
+    existing = await asyncio.to_thread(get_product_by_slug, slug)
 
     if existing:
         raise HTTPException(409, f"Product with slug '{slug}' already exists")
 
-    threshold = body.get("threshold")
-    if threshold is not None:
-        try:
-            threshold = float(threshold)
-            if threshold < 1 or threshold > 99:
-                raise ValueError("Threshold must be between 1 and 99")
-        except (TypeError, ValueError):
-            raise HTTPException(400, "Invalid threshold (must be 1-99)")
-    else:
-        threshold = 15
+    threshold = body.threshold if body.threshold is not None else 15
 
-    import asyncio
-    data = asyncio.run(get_product_full(slug))
+    data = await get_product_full(slug)
     if data is None:
         raise HTTPException(502, "Impossible de récupérer le prix StockX (Retailed API)")
     price = data["price"]
     name = data.get("name") or _slug_to_name(slug)
     image_url = data.get("image_url")
-    product = create_product(
-        slug=slug, name=name, dip_threshold=threshold, reference_price=price, image_url=image_url
+    product = await asyncio.to_thread(
+        create_product, slug=slug, name=name, dip_threshold=threshold, reference_price=price, image_url=image_url
     )
-    insert_price_history(product["id"], price)
+    invalidate_products_cache()
+    tasks.add_task(insert_price_history, product["id"], price)
+    tasks.add_task(invalidate_products_cache)
     return product
 
 
 @app.patch("/products/{slug}")
-def patch_product_threshold(slug: str, body: dict):
+def patch_product_threshold(slug: str, body: ThresholdIn):
     """Update the alert threshold for a product."""
-    threshold = body.get("threshold")
-    if threshold is None:
-        raise HTTPException(400, "Missing 'threshold' in body")
-    try:
-        threshold = float(threshold)
-        if threshold < 1 or threshold > 99:
-            raise ValueError("Threshold must be between 1 and 99")
-    except (TypeError, ValueError):
-        raise HTTPException(400, "Invalid threshold (must be 1-99)")
-
-    updated = update_product_threshold(slug, threshold)
+    updated = update_product_threshold(slug, body.threshold)
     if not updated:
         raise HTTPException(404, f"Product '{slug}' not found")
+    invalidate_products_cache()
     return {"ok": True}
 
 
@@ -158,14 +166,22 @@ def delete_products(slug: str):
     deleted = delete_product(slug)
     if not deleted:
         raise HTTPException(404, f"Product '{slug}' not found")
+    invalidate_products_cache()
     return {"ok": True}
 
 
 @app.get("/products")
 def get_products():
-    """Get all products with last price, median 30d, discount_pct."""
+    """Get all products with last price, median 30d, discount_pct. Cached for PRODUCTS_CACHE_TTL seconds."""
+    cached, generation = get_cached_products()
+    if cached is not None:
+        return cached
+
     products = get_all_products()
-    return [_enrich_product(p) for p in products]
+    histories = get_price_history_30d_bulk([p["id"] for p in products])
+    enriched = [_enrich_product(p, histories.get(p["id"], [])) for p in products]
+    store_products(enriched, generation)
+    return enriched
 
 
 @app.get("/alerts")
@@ -181,20 +197,18 @@ def get_scans():
 
 
 @app.post("/scan")
-def post_scan():
+async def post_scan():
     """Trigger an immediate scan. Returns {scanned, dips_found}."""
-    result = scan_all_products()
-    return result
+    return await scan_all_products_async()
 
 
 @app.get("/test-telegram")
-def test_telegram():
+async def test_telegram():
     """Send a test message to all Telegram chat IDs. Returns success/failure."""
-    from alerts import _get_chat_ids, _send_to_telegram
     chat_ids = _get_chat_ids()
     if not chat_ids:
         return {"ok": False, "error": "TELEGRAM_CHAT_ID not set. Use comma for multiple: 123,456"}
-    ok = _send_to_telegram({"text": "✅ RADAR — Test réussi ! Le bot est configuré."})
+    ok = await _send_to_telegram_async({"text": "✅ RADAR — Test réussi ! Le bot est configuré."})
     return {"ok": ok, "message": f"Envoyé à {len(chat_ids)} chat(s)"}
 
 
@@ -4,9 +4,11 @@ Retailed.io API client for StockX price scraping.
 import asyncio
 import logging
 import os
+import time
 from typing import Any
 
 import httpx
+import orjson
 
 RETAILED_API_KEY = os.getenv("RETAILED_API_KEY")
 RETAILED_CURRENCY = os.getenv("RETAILED_CURRENCY", "EUR")
@@ -15,6 +17,38 @@ RATE_LIMIT_DELAY = 2  # seconds between requests
 
 logger = logging.getLogger(__name__)
 
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_next_request_at = 0.0  # monotonic time of the next free rate-limit slot
+
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for Retailed.io (keep-alive across products and scans).
+    Rebuilt if the running event loop changed: connections are bound to the loop that opened them.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            http2=True,
+            # HTTP/2 multiplexes concurrent scans over one socket, so a few connections are plenty.
+            limits=httpx.Limits(max_keepalive_connections=4, max_connections=4),
+            headers={"x-api-key": RETAILED_API_KEY},
+        )
+        _client_loop = loop
+    return _client
+
+
+async def aclose_client() -> None:
+    """Close the shared AsyncClient (called at app shutdown)."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
 
 async def get_product_full(slug: str) -> dict | None:
     """
@@ -27,38 +61,39 @@ async def get_product_full(slug: str) -> dict | None:
 
     url = "https://app.retailed.io/api/v1/scraper/stockx/product"
     params = {"query": slug, "currency": RETAILED_CURRENCY, "country": RETAILED_COUNTRY}
-    headers = {"x-api-key": RETAILED_API_KEY}
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, params=params, headers=headers)
-
-            if response.status_code == 429:
-                logger.warning("Retailed.io rate limit (429) for slug=%s", slug)
-                return None
-
-            if response.status_code == 404:
-                logger.warning("Product not found (404) for slug=%s", slug)
-                return None
-
-            response.raise_for_status()
-            data: dict[str, Any] = response.json()
-
-            market = data.get("market") or {}
-            bids = market.get("bids") or {}
-            lowest_ask = bids.get("lowest_ask") or data.get("lowestAsk")
-            if lowest_ask is None:
-                logger.warning("No lowest_ask in response for slug=%s", slug)
-                return None
-
-            image_url = data.get("image") or data.get("thumbnail") or data.get("small_image") or ""
-            name = data.get("name") or " ".join(w.capitalize() for w in slug.split("-"))
-
-            return {
-                "price": float(lowest_ask),
-                "image_url": image_url if image_url else None,
-                "name": name,
-            }
+        client = _get_client()
+        response = await client.get(url, params=params)
+
+        if response.status_code == 429:
+            logger.warning("Retailed.io rate limit (429) for slug=%s", slug)
+            return None
+
+        if response.status_code == 404:
+            logger.warning("Product not found (404) for slug=%s", slug)
+            return None
+
+        response.raise_for_status()
+        data: dict[str, Any] = orjson.loads(response.content)
+
+        try:
+            lowest_ask = data["market"]["bids"]["lowest_ask"]
+        except (KeyError, TypeError):
+            lowest_ask = None
+        lowest_ask = lowest_ask or data.get("lowestAsk")
+        if lowest_ask is None:
+            logger.warning("No lowest_ask in response for slug=%s", slug)
+            return None
+
+        image_url = data.get("image") or data.get("thumbnail") or data.get("small_image") or ""
+        name = data.get("name") or slug.replace("-", " ").title()
+
+        return {
+            "price": float(lowest_ask),
+            "image_url": image_url if image_url else None,
+            "name": name,
+        }
 
     except httpx.TimeoutException:
         logger.error("Timeout fetching price for slug=%s", slug)
@@ -77,11 +112,23 @@ async def get_lowest_ask(slug: str) -> float | None:
     return data["price"] if data else None
 
 
+async def _wait_for_rate_limit() -> None:
+    """
+    Global rate limit shared by all concurrent scans: one request every RATE_LIMIT_DELAY seconds.
+    Each caller reserves the next free slot (no await in between, so this is safe without a lock).
+    """
+    global _next_request_at
+    now = time.monotonic()
+    slot = max(now, _next_request_at)
+    _next_request_at = slot + RATE_LIMIT_DELAY
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
 async def rate_limited_get_product_full(slug: str) -> dict | None:
-    """Wrapper that enforces 2 second delay between product requests."""
-    result = await get_product_full(slug)
-    await asyncio.sleep(RATE_LIMIT_DELAY)
-    return result
+    """Wrapper that enforces 2 second delay between product requests, across all callers."""
+    await _wait_for_rate_limit()
+    return await get_product_full(slug)
 
 
 async def rate_limited_get_lowest_ask(slug: str) -> float | None:
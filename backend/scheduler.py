@@ -4,18 +4,20 @@ APScheduler for periodic price scanning.
 import asyncio
 import logging
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
-from alerts import send_telegram_alert, send_telegram_scan_summary
+from alerts import send_telegram_alert_async, send_telegram_scan_summary_async
+from cache import invalidate_products_cache
 from database import (
-    get_all_products,
+    get_all_products_lean,
+    get_last_alert_timestamps,
     get_oldest_price,
-    get_recent_alerts_for_product,
-    insert_alert,
-    insert_price_history,
+    insert_alerts_bulk,
+    insert_price_history_bulk,
     insert_scan,
     update_product_image,
 )
@@ -23,15 +25,34 @@ from retailed import rate_limited_get_product_full
 
 DEFAULT_DIP_THRESHOLD = float(os.getenv("DIP_THRESHOLD", "15"))
 ANTI_SPAM_HOURS = 6
+SCAN_CONCURRENCY = 5
 
 logger = logging.getLogger(__name__)
-scheduler = BackgroundScheduler()
+scheduler = AsyncIOScheduler()
 
+# Anti-spam: product_id -> time.monotonic() of the last alert sent by this process
+_last_alert: dict[str, float] = {}
 
-async def _scan_product(product: dict) -> tuple[bool, bool]:
+
+def _warm_last_alerts() -> None:
+    """Seed _last_alert from alerts already in the DB, so a restart doesn't re-alert inside the window."""
+    now_utc = datetime.utcnow()
+    now = time.monotonic()
+    for product_id, triggered_at in get_last_alert_timestamps(ANTI_SPAM_HOURS).items():
+        try:
+            dt = datetime.fromisoformat(triggered_at.replace("Z", "+00:00"))
+        except (AttributeError, ValueError):
+            continue
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        _last_alert[product_id] = now - (now_utc - dt).total_seconds()
+
+
+async def _scan_product(product: dict) -> tuple[float | None, dict | None]:
     """
-    Scan a single product: fetch price, save to history, compare vs reference_price, send alert if needed.
-    Returns (price_updated, alert_sent).
+    Scan a single product: fetch price, compare vs reference_price, send alert if needed.
+    Returns (price, alert); price is None if the fetch failed, alert is None if none was sent.
+    The caller writes both to the DB in bulk.
     """
     product_id = product["id"]
     slug = product["slug"]
@@ -39,28 +60,28 @@ async def _scan_product(product: dict) -> tuple[bool, bool]:
 
     data = await rate_limited_get_product_full(slug)
     if data is None:
-        return False, False
+        return None, None
 
     price = data["price"]
-    insert_price_history(product_id, price)
 
     if not product.get("image_url") and data.get("image_url"):
-        update_product_image(product_id, data["image_url"])
+        await asyncio.to_thread(update_product_image, product_id, data["image_url"])
 
     reference_price = product.get("reference_price")
     if reference_price is not None:
         reference_price = float(reference_price)
     if reference_price is None or reference_price <= 0:
-        reference_price = get_oldest_price(product_id)
+        reference_price = await asyncio.to_thread(get_oldest_price, product_id)
     if reference_price is None or reference_price <= 0:
-        return True, False
+        return price, None
 
     discount_pct = (reference_price - price) / reference_price * 100
 
     threshold = float(product.get("dip_threshold") or DEFAULT_DIP_THRESHOLD)
     if discount_pct >= threshold:
-        recent = get_recent_alerts_for_product(product_id, ANTI_SPAM_HOURS)
-        if not recent:
+        now = time.monotonic()
+        if now - _last_alert.get(product_id, float("-inf")) >= ANTI_SPAM_HOURS * 3600:
+            _last_alert[product_id] = now
             alert_data = {
                 "product_id": product_id,
                 "product_name": name,
@@ -69,47 +90,61 @@ async def _scan_product(product: dict) -> tuple[bool, bool]:
                 "median_price": reference_price,
                 "discount_pct": discount_pct,
             }
-            insert_alert(
-                product_id=product_id,
-                product_name=name,
-                slug=slug,
-                alert_price=price,
-                median_price=reference_price,
-                discount_pct=discount_pct,
-            )
-            send_telegram_alert(alert_data)
-            return True, True
+            await send_telegram_alert_async(alert_data)
+            return price, alert_data
 
-    return True, False
+    return price, None
 
 
-def scan_all_products() -> dict:
+async def scan_all_products_async() -> dict:
     """
     Scan all products: fetch prices, save history, detect dips, send alerts.
+    Runs on the app's event loop; blocking Supabase calls go through a worker thread.
     Returns {scanned: N, dips_found: M}.
     """
-    products = get_all_products()
+    products = await asyncio.to_thread(get_all_products_lean)
     if not products:
         logger.info("No products to scan")
         return {"scanned": 0, "dips_found": 0}
 
-    async def _run():
-        scanned = 0
-        dips_found = 0
-        for product in products:
-            updated, alerted = await _scan_product(product)
-            if updated:
-                scanned += 1
-            if alerted:
-                dips_found += 1
-        return scanned, dips_found
-
-    scanned, dips_found = asyncio.run(_run())
+    sem = asyncio.Semaphore(SCAN_CONCURRENCY)
+
+    async def _guarded(product: dict) -> tuple[float | None, dict | None]:
+        # One product's failure must not discard the rows collected for the others
+        async with sem:
+            try:
+                return await _scan_product(product)
+            except Exception as e:
+                logger.error("Scan failed for slug=%s: %s", product.get("slug"), e)
+                return None, None
+
+    results = await asyncio.gather(*[_guarded(p) for p in products])
+    price_rows = [
+        {"product_id": p["id"], "price": price}
+        for p, (price, _) in zip(products, results)
+        if price is not None
+    ]
+    alerts = [alert for _, alert in results if alert is not None]
+    # Independent writes: alerts already sent must be recorded even if the price insert fails
+    if price_rows:
+        try:
+            await asyncio.to_thread(insert_price_history_bulk, price_rows)
+        except Exception as e:
+            logger.error("Could not insert %d price_history rows: %s", len(price_rows), e)
+    if alerts:
+        try:
+            await asyncio.to_thread(insert_alerts_bulk, alerts)
+        except Exception as e:
+            logger.error("Could not insert %d alerts: %s", len(alerts), e)
+    invalidate_products_cache()
+
+    scanned = len(price_rows)
+    dips_found = len(alerts)
     logger.info("Scan complete: %d products scanned, %d dips found", scanned, dips_found)
 
     scanned_at = datetime.utcnow().isoformat() + "Z"
     try:
-        scan_record = insert_scan(products_count=scanned, dips_found=dips_found)
+        scan_record = await asyncio.to_thread(insert_scan, products_count=scanned, dips_found=dips_found)
         scanned_at = scan_record.get("scanned_at", scanned_at)
         if hasattr(scanned_at, "isoformat"):
             scanned_at = scanned_at.isoformat()
@@ -118,7 +153,7 @@ def scan_all_products() -> dict:
 
     if dips_found == 0 and products:
         product_list = [{"name": p.get("name", p["slug"]), "slug": p["slug"]} for p in products]
-        send_telegram_scan_summary(scanned_at, product_list, dips_found)
+        await send_telegram_scan_summary_async(scanned_at, product_list, dips_found)
 
     return {"scanned": scanned, "dips_found": dips_found}
 
@@ -129,10 +164,14 @@ def get_next_scan_time() -> datetime | None:
     return job.next_run_time if job else None
 
 
-def start_scheduler():
-    """Start APScheduler with 6-hour interval and run initial scan."""
+async def start_scheduler():
+    """Start APScheduler with 6-hour interval and run initial scan, on the running event loop."""
+    try:
+        await asyncio.to_thread(_warm_last_alerts)
+    except Exception as e:
+        logger.warning("Could not load recent alerts for anti-spam: %s", e)
     scheduler.add_job(
-        scan_all_products,
+        scan_all_products_async,
         trigger=IntervalTrigger(hours=6),
         id="scan",
         next_run_time=datetime.utcnow(),